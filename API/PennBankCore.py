@@ -0,0 +1,921 @@
+import os
+import json
+import hashlib
+import mmap
+import random
+import re
+import weakref
+from abc import abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Mapping
+from nltk.tree import Tree
+import networkx as nx
+
+
+def json_load(file_path):
+    with open(file_path, 'r') as file_input:
+        return json.load(file_input)
+
+def json_dump(data, file_path):
+    with open(file_path, 'w') as file_output:
+        json.dump(data, file_output)
+
+def text_tokenize(text):
+    ## lower-cased words (keeping inner - and '), punctuation as separate tokens
+    return re.findall(r"\w+(?:[-']\w+)*|[^\w\s]", text.lower())
+
+class Dep_Graph(nx.DiGraph):
+    
+    def __init__(self):
+        super(Dep_Graph, self).__init__()
+    
+    def build_from_dep_edge(self, dep_edge_list):
+        head_ids = []
+        token_ids = []
+        for edge in dep_edge_list:
+            head_ids.append(edge[1])
+            token_ids.append(edge[2])
+        self.add_nodes_from(token_ids)
+        for head_id, token_id in zip(head_ids, token_ids):
+            if head_id != -1: 
+                self.add_edge(head_id, token_id)
+    
+    def children(self, index):
+        return list(self.successors(index))
+    
+    def parent(self, index):
+        return list(self.predecessors(index))
+    
+    def successor(self, index):
+        return nx.descendants(self, index)
+
+
+class Alias_Table:
+    '''
+    Walker/Vose alias table: after O(n) construction, each draw of an index
+    i with probability weights[i] / sum(weights) costs O(1)
+    '''
+    def __init__(self, weights):
+        size = len(weights)
+        total = float(sum(weights))
+        assert size > 0 and total > 0
+        self.size = size
+        self.prob = [weight * size / total for weight in weights]
+        self.alias = list(range(size))
+        small = [i for i, prob in enumerate(self.prob) if prob < 1.0]
+        large = [i for i, prob in enumerate(self.prob) if prob >= 1.0]
+        while small and large:
+            small_id = small.pop()
+            large_id = large.pop()
+            self.alias[small_id] = large_id
+            self.prob[large_id] = self.prob[large_id] + self.prob[small_id] - 1.0
+            if self.prob[large_id] < 1.0:
+                small.append(large_id)
+            else:
+                large.append(large_id)
+        ## leftovers are 1.0 up to floating point error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng):
+        i = int(rng.random() * self.size)
+        if rng.random() < self.prob[i]:
+            return i
+        return self.alias[i]
+
+
+class Rel_Sampler:
+    '''
+    draw rel_id from the pdtb3 index postings, stratified by 'Sense' (at a given level), 'Type' or 'Section'
+
+    a stratum is a list of distinct rel_id: pick a stratum with an alias table, then a uniform offset in it
+    a stratum made of exactly one pdtb.index posting ('Type', 'Sense' at level -1) shares that posting,
+    the others ('Sense' at level >= 0, 'Section') are built once as deduplicated rel_id lists, since a
+    relation with several senses in the same coarse stratum must not be drawn more often
+
+        weights : 'proportional' -> stratum probability ~ number of relations in it (i.e. no rebalancing)
+                  'uniform'      -> every stratum is equally likely (oversample rare senses)
+                  float alpha    -> stratum probability ~ (number of relations) ** alpha
+                  dict           -> {stratum: weight, ...}, every key must be a stratum, stratum not in dict gets weight 0
+
+    example
+        sampler = pdtb.sampler('Sense', level=0, weights='uniform', seed=42)
+        batch = sampler.sample(32)
+        batch = sampler.stratified_sample(32)
+    '''
+    def __init__(self, pdtb, key='Sense', level=-1, weights='uniform', sub_keys=None, seed=None):
+        self.key = key
+        self.level = level
+        self.rng = random.Random(seed)
+        self.strata = self._build_strata(pdtb, key, level)
+        if sub_keys is not None:
+            for sub_key in sub_keys:
+                assert sub_key in self.strata, '{} is not a stratum of {}'.format(sub_key, key)
+            self.strata = {sub_key: self.strata[sub_key] for sub_key in sub_keys}
+
+        self.stratum_names = list(self.strata.keys())
+        self.stratum_sizes = [len(self.strata[name]) for name in self.stratum_names]
+        self.stratum_weights = self._stratum_weights(weights)
+        self.stratum_table = Alias_Table(self.stratum_weights)
+
+    def _build_strata(self, pdtb, key, level):
+        strata = {}
+        if key == 'Section':
+            ## rel_id2docidOffset follows corpus order, no relation has to be read
+            for rel_id, (doc_id, _) in pdtb.rel_id2docidOffset.items():
+                strata.setdefault(pdtb._extract_folder_id(doc_id), []).append(rel_id)
+            return strata
+        elif key == 'Sense':
+            assert key in pdtb.index, 'build_index with Sense first'
+            for sense, postings in pdtb.index[key].items():
+                sense_in_level = sense.strip().split('.')
+                if level == -1:
+                    stratum = sense
+                elif level + 1 > len(sense_in_level):
+                    stratum = 'Unknown'
+                else:
+                    stratum = sense_in_level[level]
+                strata.setdefault(stratum, []).append(postings)
+        else:
+            assert key in pdtb.index, 'build_index with {} first'.format(key)
+            for sub_key, postings in pdtb.index[key].items():
+                strata[sub_key] = [postings]
+        return {stratum: self._merge_postings(postings_list) for stratum, postings_list in strata.items()}
+
+    def _merge_postings(self, postings_list):
+        if len(postings_list) == 1 and len(set(postings_list[0])) == len(postings_list[0]):
+            return postings_list[0]
+        rel_id_set = set()
+        rel_ids = []
+        for postings in postings_list:
+            for rel_id in postings:
+                if rel_id not in rel_id_set:
+                    rel_id_set.add(rel_id)
+                    rel_ids.append(rel_id)
+        return rel_ids
+
+    def _stratum_weights(self, weights):
+        if weights == 'proportional':
+            stratum_weights = list(self.stratum_sizes)
+        elif weights == 'uniform':
+            stratum_weights = [1.0 for _ in self.stratum_names]
+        elif isinstance(weights, dict):
+            for name in weights:
+                assert name in self.strata, '{} is not a stratum of {}'.format(name, self.key)
+            stratum_weights = [float(weights.get(name, 0)) for name in self.stratum_names]
+        elif isinstance(weights, (int, float)):
+            stratum_weights = [float(size) ** weights for size in self.stratum_sizes]
+        else:
+            print('weights should be proportional, uniform, a number or a dict')
+            assert False
+        ## an empty stratum can never be drawn
+        return [weight if size else 0.0 for weight, size in zip(stratum_weights, self.stratum_sizes)]
+
+    def _draw_from_stratum(self, stratum_id):
+        rel_ids = self.strata[self.stratum_names[stratum_id]]
+        return rel_ids[int(self.rng.random() * len(rel_ids))]
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+
+    def draw(self):
+        return self._draw_from_stratum(self.stratum_table.draw(self.rng))
+
+    def sample(self, batch_size):
+        '''
+        weighted sampling with replacement: every rel_id draws its stratum independently
+        '''
+        return [self.draw() for _ in range(batch_size)]
+
+    def stratified_sample(self, batch_size):
+        '''
+        stratified sampling with replacement: the batch is split over strata in proportion to
+        the stratum weights (largest remainder), then shuffled
+        '''
+        total = float(sum(self.stratum_weights))
+        quotas = [batch_size * weight / total for weight in self.stratum_weights]
+        counts = [int(quota) for quota in quotas]
+        remainders = sorted(range(len(quotas)), key=lambda i: counts[i] - quotas[i])
+        for stratum_id in remainders[:batch_size - sum(counts)]:
+            counts[stratum_id] += 1
+
+        batch = [self._draw_from_stratum(stratum_id)
+                 for stratum_id, count in enumerate(counts) for _ in range(count)]
+        self.rng.shuffle(batch)
+        return batch
+
+    def batches(self, batch_size, num_batches, stratified=False):
+        for _ in range(num_batches):
+            if stratified:
+                yield self.stratified_sample(batch_size)
+            else:
+                yield self.sample(batch_size)
+
+
+class Text_Index:
+    '''
+    positional inverted index over the RawText of Arg1, Arg2 and Connective, plus a normalized connective lexicon
+
+        postings[Attr][token] = {rel_id: [position, ...], ...}
+        lexicon[normalized connective] = [rel_id, ...]
+
+    phrase and prefix queries return rel_id in corpus order, optionally filtered by pdtb.index,
+    so the result combines with 'Type' / 'Sense' selection
+
+    example
+        text_index = pdtb.build_text_index('text_index.json')
+        text_index.connective('Even though', filters={'Type': 'Explicit'})
+        text_index.search('interest rate', 'Arg2', filters={'Sense': ['Comparison.Contrast']})
+        text_index.search('declin', 'Arg1', prefix=True)
+    '''
+    attr_list = ['Arg1', 'Arg2', 'Connective']
+
+    def __init__(self, pdtb, postings=None, lexicon=None):
+        self.pdtb = pdtb
+        self.rel_rank = {rel_id: rank for rank, rel_id in enumerate(pdtb.rel_id)}
+        if postings is None:
+            postings, lexicon = self._build(pdtb)
+        self.postings = postings
+        self.lexicon = lexicon
+        ## sorted vocabulary for prefix queries
+        self.vocab = {attr: sorted(self.postings[attr].keys()) for attr in self.attr_list}
+
+    def _build(self, pdtb):
+        postings = {attr: {} for attr in self.attr_list}
+        lexicon = {}
+        for rel_id in pdtb.rel_id:
+            for attr in self.attr_list:
+                tokens = text_tokenize(pdtb.get_raw_text(rel_id, attr))
+                for position, token in enumerate(tokens):
+                    postings[attr].setdefault(token, {}).setdefault(rel_id, []).append(position)
+                if attr == 'Connective' and tokens:
+                    lexicon.setdefault(' '.join(tokens), []).append(rel_id)
+        return postings, lexicon
+
+    def save(self, file_path):
+        ## json keys have to be str, so rel_id postings are stored as [[rel_id, [position, ...]], ...]
+        postings = {attr: {token: list(self.postings[attr][token].items()) for token in self.postings[attr]}
+                    for attr in self.attr_list}
+        json_dump({'corpus': self.corpus_key(self.pdtb), 'postings': postings, 'lexicon': self.lexicon}, file_path)
+
+    @staticmethod
+    def corpus_key(pdtb):
+        ## the folders and the ordered rel_id the index was built on
+        return {'folders': list(pdtb.relation_data.folder_names),
+                'rel_id': hashlib.md5(json.dumps(pdtb.rel_id).encode('utf-8')).hexdigest()}
+
+    @classmethod
+    def load(cls, pdtb, file_path):
+        '''
+        return None when file_path was built on another corpus (other folders or relations)
+        '''
+        data = json_load(file_path)
+        if data.get('corpus') != cls.corpus_key(pdtb):
+            return None
+        postings = {attr: {token: {rel_id: positions for rel_id, positions in data['postings'][attr][token]}
+                           for token in data['postings'][attr]}
+                    for attr in cls.attr_list}
+        return cls(pdtb, postings, data['lexicon'])
+
+    def _prefix_tokens(self, attr, prefix):
+        vocab = self.vocab[attr]
+        tokens = []
+        i = bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            tokens.append(vocab[i])
+            i += 1
+        return tokens
+
+    def _token_postings(self, attr, token, prefix=False):
+        if not prefix:
+            return self.postings[attr].get(token, {})
+        merged = {}
+        for vocab_token in self._prefix_tokens(attr, token):
+            for rel_id, positions in self.postings[attr][vocab_token].items():
+                merged.setdefault(rel_id, set()).update(positions)
+        return merged
+
+    def _filter(self, rel_ids, filters):
+        ## filters: {index_key: sub_key or [sub_key, ...]}, same keys as pdtb(index_key, sub_key)
+        if filters:
+            for index_key, sub_keys in filters.items():
+                assert index_key in self.pdtb.index
+                if not isinstance(sub_keys, list):
+                    sub_keys = [sub_keys]
+                allowed = set()
+                for sub_key in sub_keys:
+                    assert sub_key in self.pdtb.index[index_key]
+                    allowed.update(self.pdtb.index[index_key][sub_key])
+                rel_ids = rel_ids & allowed
+        return sorted(rel_ids, key=self.rel_rank.get)
+
+    def search(self, query, Attr, prefix=False, filters=None):
+        """
+        Args:
+                query(str): a word or a phrase, matched on consecutive tokens
+                Attr(str): Arg1, Arg2, Connective
+                prefix(bool): the last query token matches as a prefix
+                filters(dict): {'Type': 'Explicit', 'Sense': [...]}
+        Returns: 
+            [rel_id, ...]
+        """
+        assert Attr in self.attr_list
+        tokens = text_tokenize(query)
+        if not tokens:
+            return []
+        token_postings = [self._token_postings(Attr, token, prefix and i == len(tokens) - 1)
+                          for i, token in enumerate(tokens)]
+        ## start from the rarest token, then check the phrase positions
+        candidates = set(min(token_postings, key=len))
+        for postings in token_postings:
+            candidates &= postings.keys()
+        rel_ids = set()
+        for rel_id in candidates:
+            next_positions = set(token_postings[0][rel_id])
+            for i in range(1, len(tokens)):
+                positions = token_postings[i][rel_id]
+                next_positions = {position + 1 for position in next_positions if position + 1 in positions}
+                if not next_positions:
+                    break
+            if next_positions:
+                rel_ids.add(rel_id)
+        return self._filter(rel_ids, filters)
+
+    def connective(self, text, filters=None):
+        """
+        exact lookup in the normalized connective lexicon, e.g., 'Even  though' -> 'even though'
+        Returns: 
+            [rel_id, ...]
+        """
+        return self._filter(set(self.lexicon.get(' '.join(text_tokenize(text)), [])), filters)
+
+
+def folder_names(folder_list):
+    names = []
+    for folder_ind in folder_list:
+        index = '0{}'.format(folder_ind) if len(str(folder_ind)) == 1  else str(folder_ind)
+        names.append('wsj_{}'.format(index))
+    return names
+
+
+class Storage(Mapping):
+    '''
+    backend interface: folder_id -> {doc_id: doc, ...}, a backend has to implement __getitem__
+    the folders of a backend are read-only, anything derived from them (rel_id map, index, ...) is kept
+    in self.shared, so every API object on the same storage reuses it
+    '''
+    def __init__(self, path, folder_list):
+        self.path = path
+        self.folder_names = folder_names(folder_list)
+        for folder_name in self.folder_names:
+            if not os.path.exists(self._json_path(folder_name)):
+                print('{} does not exist, please check the path'.format(self._json_path(folder_name)))
+                assert False
+        self.shared = {}
+
+    def _json_path(self, folder_name):
+        return os.path.join(self.path, folder_name + '.json')
+
+    @abstractmethod
+    def __getitem__(self, folder_id):
+        pass
+
+    def __contains__(self, folder_id):
+        return folder_id in self.folder_names
+
+    def __iter__(self):
+        return iter(self.folder_names)
+
+    def __len__(self):
+        return len(self.folder_names)
+
+    def relation_ids(self):
+        ## (rel_id, doc_id, offset) of every relation in corpus order, a backend may override it to avoid reading docs
+        for folder_id in self:
+            for doc_id in self[folder_id]:
+                for offset, relation in enumerate(self[folder_id][doc_id]):
+                    yield relation['ID'], doc_id, offset
+
+
+class JSON_Storage(Storage):
+    '''
+    in-memory backend: every folder json is loaded at initialization
+    '''
+    def __init__(self, path, folder_list):
+        super(JSON_Storage, self).__init__(path, folder_list)
+        self.data = {folder_name: json_load(self._json_path(folder_name)) for folder_name in self.folder_names}
+
+    def __getitem__(self, folder_id):
+        return self.data[folder_id]
+
+
+class Lazy_Storage(Storage):
+    '''
+    lazy backend: a folder json is loaded the first time it is accessed
+    '''
+    def __init__(self, path, folder_list):
+        super(Lazy_Storage, self).__init__(path, folder_list)
+        self.data = {}
+
+    def __getitem__(self, folder_id):
+        if folder_id not in self.data:
+            if folder_id not in self.folder_names:
+                raise KeyError(folder_id)
+            self.data[folder_id] = json_load(self._json_path(folder_id))
+        return self.data[folder_id]
+
+
+class Mmap_Folder(Mapping):
+    '''
+    doc_id -> doc, decoded from the memory-mapped binary file on access
+    only the max_cached_docs most recently used docs are kept decoded
+    '''
+    max_cached_docs = 64
+
+    def __init__(self, bin_path, entries):
+        self.entries = {entry[0]: (entry[1], entry[2]) for entry in entries}
+        self.doc_ids = [entry[0] for entry in entries]
+        ## relation ID of every doc recorded at conversion, None if the doc is not a list of relations
+        self.record_ids = {entry[0]: entry[3] for entry in entries if len(entry) > 3}
+        self.docs = OrderedDict()
+        self.buffer = None
+        if entries:
+            with open(bin_path, 'rb') as file_input:
+                self.buffer = mmap.mmap(file_input.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, doc_id):
+        if doc_id in self.docs:
+            self.docs.move_to_end(doc_id)
+            return self.docs[doc_id]
+        offset, length = self.entries[doc_id]
+        doc = json.loads(self.buffer[offset:offset + length].decode('utf-8'))
+        self.docs[doc_id] = doc
+        if len(self.docs) > self.max_cached_docs:
+            self.docs.popitem(last=False)
+        return doc
+
+    def __contains__(self, doc_id):
+        return doc_id in self.entries
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+
+class Mmap_Storage(Storage):
+    '''
+    mmap backend: every folder json is converted once to cache_dir/folder.<hash>.bin (one utf-8 json record per doc)
+    and cache_dir/folder.<hash>.idx.json ({'source': json path, 'entries': [[doc_id, offset, length, ids], ...]}),
+    ids are the relation ID of a PDTB doc, so the rel_id map is built without decoding any doc
+    <hash> is taken from the source json path, so PDTB and PTB folders of the same name can share cache_dir
+    '''
+    def __init__(self, path, folder_list, cache_dir=None):
+        super(Mmap_Storage, self).__init__(path, folder_list)
+        self.cache_dir = cache_dir if cache_dir else path
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.data = {}
+
+    def _cache_paths(self, folder_name):
+        source = os.path.abspath(self._json_path(folder_name))
+        cache_name = '{}.{}'.format(folder_name, hashlib.md5(source.encode('utf-8')).hexdigest()[:12])
+        return source, os.path.join(self.cache_dir, cache_name + '.bin'), os.path.join(self.cache_dir, cache_name + '.idx.json')
+
+    def _convert(self, source, bin_path, idx_path):
+        entries = []
+        with open(bin_path, 'wb') as file_output:
+            for doc_id, doc in json_load(source).items():
+                record = json.dumps(doc).encode('utf-8')
+                if isinstance(doc, list) and all(isinstance(item, dict) and 'ID' in item for item in doc):
+                    ids = [item['ID'] for item in doc]
+                else:
+                    ids = None
+                entries.append([doc_id, file_output.tell(), len(record), ids])
+                file_output.write(record)
+        idx = {'source': source, 'entries': entries}
+        json_dump(idx, idx_path)
+        return idx
+
+    def _load_idx(self, folder_name):
+        source, bin_path, idx_path = self._cache_paths(folder_name)
+        ## reuse the cache only if it was converted from this json and is not older than it
+        if os.path.exists(idx_path) and os.path.exists(bin_path) and \
+           os.path.getmtime(idx_path) >= os.path.getmtime(source):
+            idx = json_load(idx_path)
+            if isinstance(idx, dict) and idx.get('source') == source:
+                return bin_path, idx
+        return bin_path, self._convert(source, bin_path, idx_path)
+
+    def __getitem__(self, folder_id):
+        if folder_id not in self.data:
+            if folder_id not in self.folder_names:
+                raise KeyError(folder_id)
+            bin_path, idx = self._load_idx(folder_id)
+            self.data[folder_id] = Mmap_Folder(bin_path, idx['entries'])
+        return self.data[folder_id]
+
+    def relation_ids(self):
+        for folder_id in self:
+            folder = self[folder_id]
+            for doc_id in folder:
+                ids = folder.record_ids.get(doc_id)
+                if ids is None:
+                    ids = [relation['ID'] for relation in folder[doc_id]]
+                for offset, rel_id in enumerate(ids):
+                    yield rel_id, doc_id, offset
+
+
+storage_backends = {'json': JSON_Storage, 'lazy': Lazy_Storage, 'mmap': Mmap_Storage}
+## weak references only: a storage is released with the last API object using it
+storage_registry = weakref.WeakValueDictionary()
+
+def load_storage(path, folder_list, backend='json', cache_dir=None):
+    '''
+    one storage per (backend, path, folders, cache_dir) in a process, i.e., PennBankAPI and PennBankAPI2
+    objects on the same data share the loaded corpus and its indexes
+    '''
+    assert backend in storage_backends, 'backend should be one of {}'.format(list(storage_backends))
+    if backend == 'mmap':
+        cache_dir = os.path.abspath(cache_dir if cache_dir else path)
+    else:
+        cache_dir = None
+    key = (backend, os.path.abspath(path), tuple(folder_names(folder_list)), cache_dir)
+    storage = storage_registry.get(key)
+    if storage is None:
+        if backend == 'mmap':
+            storage = Mmap_Storage(path, folder_list, cache_dir)
+        else:
+            storage = storage_backends[backend](path, folder_list)
+        storage_registry[key] = storage
+    return storage
+
+
+class pdtb3_core:
+    '''
+    relation engine shared by PennBankAPI.pdtb3 and PennBankAPI2.pdtb3, which only differ in output format
+        backend: 'json' (in-memory), 'lazy' (per folder), 'mmap' (binary cache in cache_dir)
+    '''
+    def __init__(self, path, folder_list=list(range(2,24)), backend='json', cache_dir=None):
+        if not os.path.exists(path):
+            print('PDTB data path does not exist, please check the path')
+            assert False
+        self.path = path
+        self.relation_data = load_storage(path, folder_list, backend, cache_dir)
+        if 'rel_id2docidOffset' not in self.relation_data.shared:
+            self.relation_data.shared['rel_id2docidOffset'] = self._build_rel_id2docidOffset_map()
+        self.rel_id2docidOffset = self.relation_data.shared['rel_id2docidOffset']
+        self.rel_id = list(self.rel_id2docidOffset.keys())
+        self.span_cache = self.relation_data.shared.setdefault('span', {})
+        self.index = {}
+        self.iter_index_key = None
+        self.iter_sub_key = None
+        self.iter_cond_func = None
+    
+    def _build_rel_id2docidOffset_map(self):
+        rel_id2docidOffset = {}
+        for rel_id, doc_id, offset in self.relation_data.relation_ids():
+            rel_id2docidOffset[rel_id] = (doc_id, offset)
+        return rel_id2docidOffset
+    
+    def query_rel_id(self, doc_id, offset):
+        folder_id = self._extract_folder_id(doc_id)
+        return self.relation_data[folder_id][doc_id][offset]['ID']
+    
+    def build_index(self, key_list):
+        ## an index built by any API object on the same storage is reused
+        shared_index = self.relation_data.shared.setdefault('index', {})
+        new_key_list = [key for key in key_list if key not in shared_index]
+        new_index = {key:{} for key in new_key_list}
+        
+        for rel_id in (self.rel_id2docidOffset if new_key_list else []):
+            unique_relation_identifier = rel_id
+            relation = self._extract_relation(rel_id)
+            for key in new_key_list:
+                assert key in relation
+                 ## multi sub-key
+                if isinstance(relation[key], list):
+                    for sub_key in relation[key]:
+                        if sub_key not in new_index[key]:
+                            new_index[key][sub_key] = [unique_relation_identifier]
+                        else:
+                            new_index[key][sub_key].append(unique_relation_identifier)
+                else:
+                    if relation[key] not in new_index[key]:
+                        new_index[key][relation[key]] = [unique_relation_identifier]
+                    else:
+                        new_index[key][relation[key]].append(unique_relation_identifier)
+        shared_index.update(new_index)
+        self.index = {key: shared_index[key] for key in key_list}
+
+    def sampler(self, key='Sense', level=-1, weights='uniform', sub_keys=None, seed=None):
+        ## key: 'Sense', 'Type' or 'Section'; level follows get_sense, see Rel_Sampler for weights
+        return Rel_Sampler(self, key=key, level=level, weights=weights, sub_keys=sub_keys, seed=seed)
+
+    def build_text_index(self, file_path=None):
+        ## load the persisted text index from file_path if it exists, otherwise build it (and save it to file_path)
+        shared = self.relation_data.shared
+        if 'text_index' in shared:
+            self.text_index = Text_Index(self, *shared['text_index'])
+            ## built by another API object on the same storage, which may not have saved it to file_path
+            if file_path and not os.path.exists(file_path):
+                self.text_index.save(file_path)
+        else:
+            self.text_index = None
+            if file_path and os.path.exists(file_path):
+                self.text_index = Text_Index.load(self, file_path)
+                if self.text_index is None:
+                    print('Warning: text index {} does not match this corpus, rebuild it'.format(file_path))
+            if self.text_index is None:
+                self.text_index = Text_Index(self)
+                if file_path:
+                    self.text_index.save(file_path)
+        shared['text_index'] = (self.text_index.postings, self.text_index.lexicon)
+        return self.text_index
+    
+    def _extract_relation(self, *argv):
+        assert len(argv) == 1 or len(argv) == 2
+        if len(argv) == 1:
+            assert argv[0] in self.rel_id2docidOffset
+            doc_id, offset = self.rel_id2docidOffset[argv[0]]
+        else:
+            assert isinstance(argv[0], str)
+            assert isinstance(argv[1], int)
+            doc_id = argv[0]
+            offset = argv[1]
+        
+        folder_id = self._extract_folder_id(doc_id)
+        return self.relation_data[folder_id][doc_id][offset]
+    
+    def _extract_folder_id(self, doc_id):
+        return doc_id[0:6]
+    
+    def get_raw_text(self, rel_id, Attr):
+        relation = self._extract_relation(rel_id)
+        return relation[Attr]['RawText']
+    
+    def get_connective(self, rel_id):
+        relation = self._extract_relation(rel_id)
+        return relation['Connective']['RawText']
+    
+    def get_sense(self, rel_id, level=0):
+        '''
+        return the sense at level 
+                Expansion.Level-of-detail.Arg2-as-detail
+                      0         1             2
+                -1 : [ Expansion.Level-of-detail.Arg2-as-detail ]
+                 O : [ Expansion ]
+                 1 : [ Level-of-detail ]
+                 2 : [ Arg2-as-detail ]       
+                
+        '''
+        relation = self._extract_relation(rel_id)
+        sense_list = relation['Sense']
+        sense_ouput_list = []
+        if level == -1:
+            return sense_list
+        for sense in sense_list:
+            sense_in_level = sense.strip().split('.')
+            if level + 1>len(sense_in_level):
+                sense_output = 'Unknown'
+                print('Warning: relation {}, with sense {},  does not have level-{} sense [level: 0, 1, 2]'.format(rel_id,sense,  level))
+            else:
+                sense_output = sense_in_level[level]
+            sense_ouput_list.append(sense_output)
+        return sense_ouput_list
+    
+    def get_type(self, rel_id):
+        relation = self._extract_relation(rel_id)
+        return relation['Type']
+    
+    def _sent_id(self, rel_id, Attr):
+        relation = self._extract_relation(rel_id)
+        doc_id = relation['DocID']
+        sent_ids = list(set([ind[3] for ind in relation[Attr]['TokenList']]))
+        return doc_id, sent_ids
+    
+    def get_rel_sent_id(self, rel_id):
+        '''
+        input rel_id
+        return the minimum sentences id list that cover this relation
+         '''
+        arg1_doc_id, arg1_sents_id=self._sent_id(rel_id,'Arg1')
+        doc_id, arg2_sents_id=self._sent_id(rel_id,'Arg2')
+        assert doc_id == arg1_doc_id
+        return doc_id, sorted(list(set(arg1_sents_id) | set(arg2_sents_id)))
+    
+    def _token_id(self, rel_id, Attr):
+        relation = self._extract_relation(rel_id)
+        doc_id = relation['DocID']
+        token_id_list = []
+        token_id_set = set()
+        for ind in relation[Attr]['TokenList']:
+            if (ind[3], ind[4]) not in token_id_set:
+                token_id_set.add((ind[3], ind[4]))
+                token_id_list.append((ind[3], ind[4]))
+        return doc_id, token_id_list
+    
+    def _token_span(self, rel_id, Attr):
+        ## contiguous token runs of Attr, computed once per (rel_id, Attr) and cached
+        if (rel_id, Attr) in self.span_cache:
+            return self.span_cache[(rel_id, Attr)]
+        relation = self._extract_relation(rel_id)
+        doc_id = relation['DocID']
+        span_list = []
+        for sent_id, offset in sorted(set((ind[3], ind[4]) for ind in relation[Attr]['TokenList'])):
+            if span_list and span_list[-1][0] == sent_id and span_list[-1][2] == offset:
+                span_list[-1] = (sent_id, span_list[-1][1], offset + 1)
+            else:
+                span_list.append((sent_id, offset, offset + 1))
+        ## stored as a tuple, the cache is shared by every API object on the same storage
+        self.span_cache[(rel_id, Attr)] = (doc_id, tuple(span_list))
+        return self.span_cache[(rel_id, Attr)]
+    
+    def __iter__(self):
+        
+        if (not self.iter_index_key) and (not self.iter_cond_func):  
+            for rel_id in self.rel_id:
+                yield rel_id
+        
+        elif self.iter_index_key:
+            assert self.index
+            if isinstance(self.iter_sub_key, list):
+                assert self.iter_index_key in self.index 
+                rel_id_list = []
+                for sub_key in self.iter_sub_key:
+                    assert sub_key in self.index[self.iter_index_key]
+                    rel_id_list+= self.index[self.iter_index_key][sub_key]
+                
+                for rel_id in rel_id_list:
+                    yield rel_id
+            else:
+                assert self.iter_index_key in self.index and self.iter_sub_key in self.index[self.iter_index_key]
+                for rel_id in self.index[self.iter_index_key][self.iter_sub_key]:
+                    yield rel_id
+        
+        elif self.iter_cond_func:
+            for rel_id in self.rel_id:
+                if self.iter_cond_func(self, rel_id):
+                    yield rel_id
+    
+    def __call__(self, index_key=None, sub_key=None, iter_cond_func = None):
+        ## FOR ITERATION
+        ## you can simply access to rel_id by either key or user-defined iteration condition function
+        ## example 
+        ##     for rel_id in pdtb('Type','Implicit')
+        ##     for rel_id in pdtb('Sense','Comparison')
+        ##     for rel_id in pdtb(iter_cond_fun c)    
+        ##             iter_cond_func take pdtb and rel_id as input to check whether this rel_id is qualified, user should implement the inside decision logic
+        self.iter_index_key= index_key
+        self.iter_sub_key = sub_key
+        self.iter_cond_func = iter_cond_func
+        return self
+        
+    def __len__(self):
+        return len(self.rel_id)
+    
+class ptb3_core:
+    '''
+    parsing engine shared by PennBankAPI.ptb3 and PennBankAPI2.ptb3, which only differ in output format
+        backend: 'json' (in-memory), 'lazy' (per folder), 'mmap' (binary cache in cache_dir)
+    '''
+    def __init__(self, path, folder_list=list(range(2,24)), backend='json', cache_dir=None):
+        self.path = path
+        self.parsing_data = load_storage(path, folder_list, backend, cache_dir)
+    
+    @property
+    def docid(self):
+        ## lazy so that the 'lazy' and 'mmap' backends do not read every folder at initialization
+        if 'docid' not in self.parsing_data.shared:
+            self.parsing_data.shared['docid'] = self._transvere_docid()
+        return self.parsing_data.shared['docid']
+    
+    def _transvere_docid(self):
+        doc_id = []
+        for folder_id in self.parsing_data:
+            doc_id += list(self.parsing_data[folder_id].keys())
+        return doc_id
+    
+    def _extract_parse_file(self, doc_id):
+        folder_id = self._extract_folder_id(doc_id)
+        return self.parsing_data[folder_id][doc_id]['sentences']
+    
+    def get_sent_num(self, doc_id):
+        return len(self._extract_parse_file(doc_id))
+    
+    def _extract_folder_id(self, doc_id):
+        return doc_id[0:6]
+    
+    def get_dependency(self, doc_id, token_indices):
+        """
+        Args:
+                doc_id(str)
+                token_indices[(sent#, token#), ...]
+        Returns:
+                dependencies[list[relation, (head(int), token(int))], ...]
+        """
+        
+        doc = self._extract_parse_file(doc_id)
+        dependencies = []
+        for sent_id, token_id in token_indices:
+            sent_dependency = doc[sent_id]['dependencies']
+            dep_text = self._get_token_dependency(sent_dependency, token_id)
+            dep_relation = dep_text[0]
+            head_id = self._get_index(dep_text[1]) - 1 
+            token_id = self._get_index(dep_text[2]) - 1
+            dependencies.append([dep_relation, head_id, token_id])
+        return dependencies
+    
+    def _get_token_dependency(self, sent_dependency, token_id):
+        const = token_id+1
+        dep_index = self._get_dep_index(token_id, sent_dependency)
+        while const != dep_index:
+            token_id -= (dep_index - const)
+            print(token_id)
+            dep_index = self._get_dep_index(token_id, sent_dependency)
+        if token_id >= len(sent_dependency):
+            return sent_dependency[-1]
+        else:
+            return sent_dependency[token_id]
+
+    def _get_dep_index(self, index, sent_dependency):
+#         return int(sent_dependency[index][2].split('-')[-1])
+        if index>= len(sent_dependency): 
+            assert index+1 <= self._get_index(sent_dependency[-1][2])
+            return self._get_index(sent_dependency[-1][2])
+        else:
+            return self._get_index(sent_dependency[index][2])
+
+    def _get_index(self, text):
+        return int(text.split('-')[-1])
+
+    def _tokens_text(self, doc_id, token_indices):
+        doc = self._extract_parse_file(doc_id)
+        return [self._token_trans_(doc[sent_id]['words'][token_id][0]) for sent_id, token_id in token_indices]
+
+    def _span_tokens_text(self, doc_id, span_indices):
+        doc = self._extract_parse_file(doc_id)
+        return [[self._token_trans_(token[0]) for token in doc[sent_id]['words'][start:end]]
+                for sent_id, start, end in span_indices]
+
+    def _sent_tokens_text(self, doc_id, sent_id):
+        doc = self._extract_parse_file(doc_id)
+        return [self._token_trans_(token[0]) for token in doc[sent_id]['words']]
+    
+    # modify . . . -> ... since . . . will cause tokenization error in wordpiece tokenization
+    special_dict = {'``': '"', '\'\'':'"', '-RRB-':')' , '-LRB-':'(', '-LCB-':'{', '-RCB-':'}', '...': '...'}
+    ## original ... -> . . .
+    #special_dict = {'``': '"', '\'\'':'"', '-RRB-':')' , '-LRB-':'(', '-LCB-':'{', '-RCB-':'}', '...': '. . .'}
+
+    def _token_trans_(self, token):
+        if token in self.special_dict:
+            token = self.special_dict[token]
+        if  '\\/' in token:
+            token = token.replace('\\/','/')
+        if '``' in token:
+            token = token.replace('``','"')
+        return token
+        
+    def get_parse_tree(self, doc_id, sent_id):
+        """
+        Args:
+                doc_id(str)
+                sent_id(int)
+        Returns:
+                parse_tree(str)
+        """
+        doc = self._extract_parse_file(doc_id)
+        return Tree.fromstring(doc[sent_id]['parsetree'][1:-3])
+    
+    def get_sent_dependency(self, doc_id, sent_id):
+        doc = self._extract_parse_file(doc_id)
+        dependencies = []
+        # There are some sentences that DONT have dependency and constintuency trees. We have to identify it and output nothing
+        if len(doc[sent_id]['dependencies'])== 1 and  'ROOT' in doc[sent_id]['dependencies'][0][2]:
+            print(doc[sent_id]['dependencies'])
+            return dependencies
+        
+        for token_dep in doc[sent_id]['dependencies']:
+            dep_text = token_dep
+            dep_relation = dep_text[0]
+            head_id = self._get_index(dep_text[1]) - 1 
+            token_id = self._get_index(dep_text[2]) - 1
+            dependencies.append([dep_relation, head_id, token_id])
+        return dependencies
+    
+    def get_sent_dependency_graph(self, doc_id, sent_id):
+        d_graph = Dep_Graph()
+        dep_edges = self.get_sent_dependency(doc_id, sent_id)
+        if dep_edges:
+            d_graph.build_from_dep_edge(dep_edges)
+            return d_graph
+        else:
+            return None
+    
+    def __len__(self):
+        return len(self.docid)
+    
+    def __iter__(self):
+        return iter(self.docid)